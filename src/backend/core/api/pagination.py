@@ -0,0 +1,146 @@
+"""Pagination helpers for the impress core app API."""
+
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from rest_framework import exceptions, response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(values):
+    """Encode the ordering values of the last object of a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(
+        json.dumps(values, default=str).encode("utf-8")
+    ).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Decode a cursor encoded by `encode_cursor` to the list of its values."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as excpt:
+        raise exceptions.NotFound("Invalid cursor") from excpt
+
+    if not isinstance(values, list):
+        raise exceptions.NotFound("Invalid cursor")
+    return values
+
+
+def get_keyset_filter(ordering, values):
+    """
+    Build the condition selecting the objects that come after the given values in
+    the given ordering, comparing values in lexicographic order. NULL values are
+    sorted like PostgreSQL does by default: last in ascending order and first in
+    descending order.
+    """
+    conditions = []
+    previous_fields_equal = Q()
+    for field, value in zip(ordering, values, strict=True):
+        name = field.removeprefix("-")
+        is_descending = field.startswith("-")
+
+        if value is None:
+            is_equal = Q(**{f"{name}__isnull": True})
+            is_after = Q(**{f"{name}__isnull": False}) if is_descending else None
+        else:
+            is_equal = Q(**{name: value})
+            is_after = Q(**{f"{name}__{'lt' if is_descending else 'gt'}": value})
+            if not is_descending:
+                is_after |= Q(**{f"{name}__isnull": True})
+
+        if is_after is not None:
+            conditions.append(previous_fields_equal & is_after)
+        previous_fields_equal &= is_equal
+
+    return reduce(or_, conditions) if conditions else Q(pk__in=[])
+
+
+class KeysetPaginationMixin:
+    """
+    Add a keyset pagination mode to a page number pagination class. It is enabled by
+    passing a "cursor" query parameter, empty for the first page, and then following
+    the "next" links.
+
+    Pages are selected by comparing the ordering fields of the queryset, with the
+    primary key as tie-break, to the values of the last object of the previous page.
+    Deep pages are therefore as fast as the first one and no count query is run.
+    """
+
+    cursor_query_param = "cursor"
+    keyset_ordering = None
+    next_cursor = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate by keyset if a cursor is passed or by page number otherwise."""
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.keyset_ordering = self.get_keyset_ordering(queryset)
+        queryset = queryset.order_by(*self.keyset_ordering)
+
+        cursor = request.query_params[self.cursor_query_param]
+        values = decode_cursor(cursor) if cursor else None
+        if values is not None and len(values) != len(self.keyset_ordering):
+            raise exceptions.NotFound("Invalid cursor")
+
+        try:
+            if values is not None:
+                queryset = queryset.filter(
+                    get_keyset_filter(self.keyset_ordering, values)
+                )
+            objects = list(queryset[: page_size + 1])
+        except (ValidationError, ValueError, TypeError) as excpt:
+            raise exceptions.NotFound("Invalid cursor") from excpt
+
+        page = objects[:page_size]
+        if len(objects) > page_size:
+            self.next_cursor = encode_cursor(
+                [
+                    getattr(page[-1], field.removeprefix("-"))
+                    for field in self.keyset_ordering
+                ]
+            )
+        return page
+
+    @staticmethod
+    def get_keyset_ordering(queryset):
+        """
+        Return the ordering of the queryset with the primary key appended as tie-break
+        so that the ordering is total.
+        """
+        ordering = list(queryset.query.order_by or queryset.query.get_meta().ordering)
+        if not all(isinstance(field, str) for field in ordering):
+            raise exceptions.ValidationError(
+                {"cursor": "Keyset pagination is not supported for this ordering."}
+            )
+
+        if not {"pk", "id"}.intersection(field.removeprefix("-") for field in ordering):
+            is_descending = bool(ordering) and ordering[-1].startswith("-")
+            ordering.append("-pk" if is_descending else "pk")
+        return ordering
+
+    def get_next_cursor_link(self):
+        """Return the link to the next page in keyset mode or None on the last page."""
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        """Return a response without count nor previous link in keyset mode."""
+        if self.keyset_ordering is None:
+            return super().get_paginated_response(data)
+
+        return response.Response({"next": self.get_next_cursor_link(), "results": data})
@@ -146,7 +146,6 @@ class ListDocumentSerializer(BaseResourceSerializer):
     """Serialize documents with limited fields for display in lists."""
 
     is_favorite = serializers.BooleanField(read_only=True)
-    nb_accesses = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = models.Document
@@ -175,6 +174,15 @@ class ListDocumentSerializer(BaseResourceSerializer):
             "updated_at",
         ]
 
+    def get_fields(self):
+        """Drop the content field when the list is requested without content."""
+        fields = super().get_fields()
+
+        if self.context.get("with_content") is False:
+            fields.pop("content", None)
+
+        return fields
+
 
 class DocumentSerializer(ListDocumentSerializer):
     """Serialize documents with all fields for display in detail views."""
@@ -492,6 +500,12 @@ class InvitationSerializer(serializers.ModelSerializer):
         return role
 
 
+class ListDocumentFilterSerializer(serializers.Serializer):
+    """Validate options applied to the document list endpoint."""
+
+    with_content = serializers.BooleanField(required=False, default=True)
+
+
 class VersionFilterSerializer(serializers.Serializer):
     """Validate version filters applied to the list endpoint."""
 
@@ -8,13 +8,16 @@ from urllib.parse import urlparse
 
 from django.conf import settings
 from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.search import TrigramSimilarity
 from django.core.exceptions import ValidationError
 from django.core.files.storage import default_storage
 from django.db import models as db
 from django.db.models import (
-    Count,
+    CharField,
     Exists,
+    F,
+    Func,
     OuterRef,
     Q,
     Subquery,
@@ -35,6 +38,7 @@ from core.services.collaboration_services import CollaborationService
 
 from . import permissions, serializers, utils
 from .filters import DocumentFilter
+from .pagination import KeysetPaginationMixin
 
 logger = logging.getLogger(__name__)
 
@@ -124,8 +128,11 @@ class SerializerPerActionMixin:
         return self.serializer_classes.get(self.action, self.default_serializer_class)
 
 
-class Pagination(drf.pagination.PageNumberPagination):
-    """Pagination to display no more than 100 objects per page sorted by creation date."""
+class Pagination(KeysetPaginationMixin, drf.pagination.PageNumberPagination):
+    """
+    Pagination to display no more than 100 objects per page sorted by creation date.
+    Passing a "cursor" query parameter switches to keyset pagination.
+    """
 
     ordering = "-created_on"
     max_page_size = 100
@@ -320,9 +327,20 @@ class DocumentViewSet(
         - `is_favorite=false`: Returns documents not marked as favorite by the current user
         - `title=hello`: Returns documents which title contains the "hello" string
 
+    Options:
+        - `with_content=false`: Omit the content of documents in the list (avoids
+          fetching it from object storage when it is not displayed)
+
+    Pagination:
+        - `page=2`: Returns the second page of documents
+        - `cursor=`: Returns the first page of documents with keyset pagination. The
+          response has no count and its "next" link carries the cursor of the next page.
+
     Example Usage:
         - GET /api/v1.0/documents/?is_creator_me=true&is_favorite=true
         - GET /api/v1.0/documents/?is_creator_me=false&title=hello
+        - GET /api/v1.0/documents/?with_content=false
+        - GET /api/v1.0/documents/?cursor=&ordering=title
     """
 
     filter_backends = [drf_filters.DjangoFilterBackend, filters.OrderingFilter]
@@ -330,6 +348,7 @@ class DocumentViewSet(
     metadata_class = DocumentMetadata
     ordering = ["-updated_at"]
     ordering_fields = ["created_at", "is_favorite", "updated_at", "title"]
+    pagination_class = Pagination
     permission_classes = [
         permissions.AccessPermission,
     ]
@@ -349,9 +368,6 @@ class DocumentViewSet(
         queryset = super().get_queryset()
         user = self.request.user
 
-        # Annotate the number of accesses associated with each document
-        queryset = queryset.annotate(nb_accesses=Count("accesses", distinct=True))
-
         if not user.is_authenticated:
             # If the user is not authenticated, annotate `is_favorite` as False
             return queryset.annotate(is_favorite=Value(False))
@@ -374,13 +390,32 @@ class DocumentViewSet(
         )
         return queryset.annotate(user_roles=Subquery(user_roles_query)).distinct()
 
+    def get_user_documents_queryset(self, user):
+        """
+        Get documents visible to a user from the visibility index, with the role of the
+        user and their favorite flag precomputed. It only joins one index row per
+        document so the queryset does not need to be made distinct.
+        """
+        return models.Document.objects.filter(
+            user_documents__user=user, user_documents__is_visible=True
+        ).annotate(
+            is_favorite=F("user_documents__is_favorite"),
+            user_roles=Func(
+                F("user_documents__role"),
+                template="ARRAY_REMOVE(ARRAY[%(expressions)s], '')",
+                output_field=ArrayField(CharField()),
+            ),
+        )
+
     def list(self, request, *args, **kwargs):
         """Restrict resources returned by the list endpoint"""
-        queryset = self.filter_queryset(self.get_queryset())
         user = self.request.user
 
-        if user.is_authenticated:
-            queryset = queryset.filter(
+        if user.is_authenticated and not user.teams:
+            queryset = self.filter_queryset(self.get_user_documents_queryset(user))
+        elif user.is_authenticated:
+            # Accesses given to teams are not indexed
+            queryset = self.filter_queryset(self.get_queryset()).filter(
                 db.Q(accesses__user=user)
                 | db.Q(accesses__team__in=user.teams)
                 | (
@@ -389,14 +424,31 @@ class DocumentViewSet(
                 )
             )
         else:
-            queryset = queryset.none()
+            queryset = self.filter_queryset(self.get_queryset()).none()
+
+        # Validate list options using dedicated serializer
+        options_serializer = serializers.ListDocumentFilterSerializer(
+            data=request.query_params
+        )
+        options_serializer.is_valid(raise_exception=True)
+        with_content = options_serializer.validated_data["with_content"]
 
         page = self.paginate_queryset(queryset)
+        documents = page if page is not None else list(queryset)
+
+        # Fetch the content of all documents of the page at once rather than letting
+        # the serializer fetch them one after the other
+        if with_content:
+            models.Document.prefetch_content(documents)
+
+        serializer = self.get_serializer(
+            documents,
+            many=True,
+            context={**self.get_serializer_context(), "with_content": with_content},
+        )
+
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(queryset, many=True)
         return drf.response.Response(serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
@@ -503,7 +555,7 @@ class DocumentViewSet(
         document = self.get_object()
 
         try:
-            response = document.get_content_response(version_id=version_id)
+            version = document.get_content_version(version_id)
         except (FileNotFoundError, ClientError) as err:
             raise Http404 from err
 
@@ -516,7 +568,7 @@ class DocumentViewSet(
                 db.Q(user=user) | db.Q(team__in=user.teams),
             )
         )
-        if response["LastModified"] < min_datetime:
+        if version["last_modified"] < min_datetime:
             raise Http404
 
         if request.method == "DELETE":
@@ -525,13 +577,7 @@ class DocumentViewSet(
                 status=response["ResponseMetadata"]["HTTPStatusCode"]
             )
 
-        return drf.response.Response(
-            {
-                "content": response["Body"].read().decode("utf-8"),
-                "last_modified": response["LastModified"],
-                "id": version_id,
-            }
-        )
+        return drf.response.Response({**version, "id": version_id})
 
     @drf.decorators.action(detail=True, methods=["put"], url_path="link-configuration")
     def link_configuration(self, request, *args, **kwargs):
@@ -892,6 +938,10 @@ class TemplateViewSet(
         queryset = super().get_queryset()
         user = self.request.user
 
+        # Accesses are serialized along with each template
+        if self.action in ["list", "retrieve"]:
+            queryset = queryset.prefetch_related("accesses")
+
         if not user.is_authenticated:
             return queryset
 
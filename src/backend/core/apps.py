@@ -1,11 +1,17 @@
 """Impress Core application"""
-# from django.apps import AppConfig
-# from django.utils.translation import gettext_lazy as _
 
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
 
-# class CoreConfig(AppConfig):
-#     """Configuration class for the impress core app."""
 
-#     name = "core"
-#     app_label = "core"
-#     verbose_name = _("impress core application")
+class CoreConfig(AppConfig):
+    """Configuration class for the impress core app."""
+
+    name = "core"
+    app_label = "core"
+    verbose_name = _("impress core application")
+
+    def ready(self):
+        """Register signal receivers."""
+        # pylint: disable=import-outside-toplevel, unused-import
+        from core import signals
@@ -0,0 +1,70 @@
+"""compress_documents management command"""
+
+import logging
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from botocore.exceptions import ClientError
+
+from core import models
+
+logger = logging.getLogger("impress.commands.compress_documents")
+
+
+class Command(BaseCommand):
+    """
+    Rewrite compressed the contents of documents stored uncompressed in object storage.
+    As object storage is versioned, each rewrite creates a new version of the document.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        """Add arguments to limit the documents processed by the command."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of documents fetched from the database at once.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            default=False,
+            help="Only count the documents that would be compressed.",
+        )
+
+    def handle(self, *args, **options):
+        """Compress the contents of all documents one by one."""
+        if not settings.DOCUMENT_CONTENT_COMPRESSION:
+            raise CommandError(
+                "Compression is disabled, set DOCUMENT_CONTENT_COMPRESSION to True "
+                "before compressing existing documents."
+            )
+
+        compressed_count = 0
+        documents = models.Document.objects.only("pk", "content_hash").order_by("pk")
+        for document in documents.iterator(chunk_size=options["batch_size"]):
+            if options["dry_run"]:
+                compressed_count += self.is_stored_uncompressed(document)
+            elif document.compress_stored_content():
+                compressed_count += 1
+                logger.info("Compressed content of document %s", document.pk)
+
+        self.stdout.write(
+            f"{compressed_count:d} document(s) "
+            f"{'to compress' if options['dry_run'] else 'compressed'}."
+        )
+
+    @staticmethod
+    def is_stored_uncompressed(document):
+        """Check the content encoding of a document without downloading its content."""
+        try:
+            response = default_storage.connection.meta.client.head_object(
+                Bucket=default_storage.bucket_name, Key=document.file_key
+            )
+        except ClientError:
+            return False
+        return response.get("ContentEncoding") != "gzip"
@@ -0,0 +1,54 @@
+"""repair_nb_accesses management command"""
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from core import models
+
+logger = logging.getLogger("impress.commands.repair_nb_accesses")
+
+
+class Command(BaseCommand):
+    """
+    Recompute the number of accesses stored on documents from their accesses, for
+    example after accesses were created or deleted without going through the models.
+    """
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        """Add arguments to limit the documents processed at once by the command."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of documents updated in one query.",
+        )
+
+    def handle(self, *args, **options):
+        """Repair the number of accesses of all documents batch by batch."""
+        repaired_count = 0
+        document_ids = models.Document.objects.order_by("pk").values_list(
+            "pk", flat=True
+        )
+        batch = []
+        for document_id in document_ids.iterator(chunk_size=options["batch_size"]):
+            batch.append(document_id)
+            if len(batch) == options["batch_size"]:
+                repaired_count += self.repair(batch)
+                batch = []
+        repaired_count += self.repair(batch)
+
+        self.stdout.write(f"{repaired_count:d} document(s) repaired.")
+
+    @staticmethod
+    def repair(document_ids):
+        """Repair the number of accesses of a batch of documents and log it."""
+        if not document_ids:
+            return 0
+
+        count = models.Document.repair_nb_accesses(document_ids)
+        if count:
+            logger.info("Repaired number of accesses of %d document(s)", count)
+        return count
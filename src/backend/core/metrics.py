@@ -0,0 +1,29 @@
+"""
+Lightweight counters to monitor the behavior of the impress core application.
+
+Counters are stored in the cache so that they are shared between all the processes
+of a deployment when the cache is shared (e.g. Redis).
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def get_counter_key(name):
+    """Return the cache key under which a counter is stored."""
+    return f"metrics_{name:s}"
+
+
+def increment_counter(name, delta=1):
+    """Atomically increment a counter, creating it if it does not exist yet."""
+    cache = caches[settings.METRICS_CACHE_ALIAS]
+    key = get_counter_key(name)
+
+    # Try to create the counter first as "incr" fails on missing keys
+    if not cache.add(key, delta, timeout=None):
+        cache.incr(key, delta)
+
+
+def get_counter(name):
+    """Return the current value of a counter."""
+    return caches[settings.METRICS_CACHE_ALIAS].get(get_counter_key(name), 0)
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_make_document_creator_and_invitation_issuer_optional'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, help_text='MD5 digest of the content stored in object storage', max_length=32, verbose_name='content hash'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='content_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, help_text='size in bytes of the content stored in object storage', null=True, verbose_name='content size'),
+        ),
+    ]
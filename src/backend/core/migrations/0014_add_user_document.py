@@ -0,0 +1,62 @@
+# Generated by Django 5.1.4 on 2026-10-18 03:29
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+POPULATE_USER_DOCUMENTS = """
+INSERT INTO impress_user_document (
+    id, created_at, updated_at, user_id, document_id,
+    role, has_link_trace, is_favorite, is_visible
+)
+SELECT
+    gen_random_uuid(), NOW(), NOW(), r.user_id, r.document_id,
+    COALESCE(a.role, ''),
+    t.id IS NOT NULL,
+    f.id IS NOT NULL,
+    a.id IS NOT NULL OR (t.id IS NOT NULL AND d.link_reach <> 'restricted')
+FROM (
+    SELECT user_id, document_id FROM impress_document_access WHERE user_id IS NOT NULL
+    UNION SELECT user_id, document_id FROM impress_link_trace
+    UNION SELECT user_id, document_id FROM impress_document_favorite
+) r
+JOIN impress_document d ON d.id = r.document_id
+LEFT JOIN impress_document_access a
+    ON a.user_id = r.user_id AND a.document_id = r.document_id
+LEFT JOIN impress_link_trace t
+    ON t.user_id = r.user_id AND t.document_id = r.document_id
+LEFT JOIN impress_document_favorite f
+    ON f.user_id = r.user_id AND f.document_id = r.document_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_document_content_hash_document_content_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDocument',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='primary key for the record as UUID', primary_key=True, serialize=False, verbose_name='id')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='date and time at which a record was created', verbose_name='created on')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='date and time at which a record was last updated', verbose_name='updated on')),
+                ('role', models.CharField(blank=True, choices=[('reader', 'Reader'), ('editor', 'Editor'), ('administrator', 'Administrator'), ('owner', 'Owner')], max_length=20)),
+                ('has_link_trace', models.BooleanField(default=False)),
+                ('is_favorite', models.BooleanField(default=False)),
+                ('is_visible', models.BooleanField(default=False, help_text='Whether the document is listed for the user: the user has a role on it or visited it while its link reach was not restricted.')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_documents', to='core.document')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_documents', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User/document visibility',
+                'verbose_name_plural': 'User/document visibilities',
+                'db_table': 'impress_user_document',
+                'constraints': [models.UniqueConstraint(fields=('user', 'document'), name='unique_user_document')],
+            },
+        ),
+        migrations.RunSQL(POPULATE_USER_DOCUMENTS, reverse_sql=migrations.RunSQL.noop),
+    ]
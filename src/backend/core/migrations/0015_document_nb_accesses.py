@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 03:49
+
+from django.db import migrations, models
+
+POPULATE_NB_ACCESSES = """
+UPDATE impress_document d
+SET nb_accesses = a.count
+FROM (
+    SELECT document_id, COUNT(*) AS count
+    FROM impress_document_access
+    GROUP BY document_id
+) a
+WHERE a.document_id = d.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_add_user_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='nb_accesses',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='number of accesses to the document, maintained by its accesses', verbose_name='number of accesses'),
+        ),
+        migrations.RunSQL(POPULATE_NB_ACCESSES, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -1,13 +1,17 @@
 """
 Declare and configure the models for the impress core application
 """
+# pylint: disable=too-many-lines
 
+import gzip
 import hashlib
 import smtplib
 import tempfile
 import textwrap
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from functools import partial
 from io import BytesIO
 from logging import getLogger
 
@@ -16,10 +20,12 @@ from django.contrib.auth import models as auth_models
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.sites.models import Site
 from django.core import exceptions, mail, validators
+from django.core.cache import caches
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.core.mail import send_mail
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.http import FileResponse
 from django.template.base import Template as DjangoTemplate
 from django.template.context import Context
@@ -36,6 +42,8 @@ import weasyprint
 from botocore.exceptions import ClientError
 from timezone_field import TimeZoneField
 
+from core import metrics, tasks
+
 logger = getLogger(__name__)
 
 
@@ -56,6 +64,37 @@ def get_resource_roles(resource, user):
     return roles
 
 
+def cache_document_content(key, value, size):
+    """
+    Store a value in the document content cache.
+
+    The eviction policy is size-aware: contents bigger than the size threshold are kept
+    for a time inversely proportional to their size and contents bigger than the
+    maximum size are not cached at all, so that a few big documents can't evict many
+    small hot ones.
+    """
+    if size > settings.DOCUMENT_CONTENT_CACHE_MAX_SIZE:
+        return
+
+    timeout = settings.DOCUMENT_CONTENT_CACHE_TIMEOUT
+    threshold = settings.DOCUMENT_CONTENT_CACHE_SIZE_THRESHOLD
+    if size > threshold:
+        timeout = max(1, timeout * threshold // size)
+
+    caches[settings.DOCUMENT_CONTENT_CACHE_ALIAS].set(key, value, timeout)
+
+
+def read_document_content(response):
+    """
+    Read the body of a document content object as returned by object storage and
+    decompress it if it was stored compressed.
+    """
+    bytes_content = response["Body"].read()
+    if response.get("ContentEncoding") == "gzip":
+        return gzip.decompress(bytes_content)
+    return bytes_content
+
+
 class LinkRoleChoices(models.TextChoices):
     """Defines the possible roles a link can offer on a document."""
 
@@ -240,8 +279,14 @@ class User(AbstractBaseUser, BaseModel, auth_models.PermissionsMixin):
             ]
         )
 
-        # Set creator of documents if not yet set (e.g. documents created via server-to-server API)
+        # Bulk creation does not send signals nor call the save method of accesses
         document_ids = [invitation.document_id for invitation in valid_invitations]
+        UserDocument.sync(self.pk, document_ids)
+        Document.objects.filter(id__in=document_ids).update(
+            nb_accesses=models.F("nb_accesses") + 1
+        )
+
+        # Set creator of documents if not yet set (e.g. documents created via server-to-server API)
         Document.objects.filter(id__in=document_ids, creator__isnull=True).update(
             creator=self
         )
@@ -287,24 +332,25 @@ class BaseAccess(BaseModel):
         """
         roles = []
         if user.is_authenticated:
-            teams = user.teams
             try:
                 roles = self.user_roles or []
             except AttributeError:
-                try:
-                    roles = resource.accesses.filter(
-                        models.Q(user=user) | models.Q(team__in=teams),
-                    ).values_list("role", flat=True)
-                except (self._meta.model.DoesNotExist, IndexError):
-                    roles = []
+                # Accesses serialized along with their resource rely on the roles
+                # annotated on the resource
+                roles = get_resource_roles(resource, user)
 
         is_owner_or_admin = bool(
             set(roles).intersection({RoleChoices.OWNER, RoleChoices.ADMIN})
         )
         if self.role == RoleChoices.OWNER:
+            # Count owners in Python so that prefetched accesses don't cost a query
             can_delete = (
                 RoleChoices.OWNER in roles
-                and resource.accesses.filter(role=RoleChoices.OWNER).count() > 1
+                and sum(
+                    access.role == RoleChoices.OWNER
+                    for access in resource.accesses.all()
+                )
+                > 1
             )
             set_role_to = (
                 [RoleChoices.ADMIN, RoleChoices.EDITOR, RoleChoices.READER]
@@ -336,7 +382,7 @@ class BaseAccess(BaseModel):
         }
 
 
-class Document(BaseModel):
+class Document(BaseModel):  # pylint: disable=too-many-public-methods
     """Pad document carrying the content."""
 
     title = models.CharField(_("title"), max_length=255, null=True, blank=True)
@@ -355,6 +401,26 @@ class Document(BaseModel):
         blank=True,
         null=True,
     )
+    content_hash = models.CharField(
+        _("content hash"),
+        help_text=_("MD5 digest of the content stored in object storage"),
+        max_length=32,
+        blank=True,
+        editable=False,
+    )
+    content_size = models.PositiveBigIntegerField(
+        _("content size"),
+        help_text=_("size in bytes of the content stored in object storage"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    nb_accesses = models.PositiveIntegerField(
+        _("number of accesses"),
+        help_text=_("number of accesses to the document, maintained by its accesses"),
+        default=0,
+        editable=False,
+    )
 
     _content = None
 
@@ -368,34 +434,175 @@ class Document(BaseModel):
         return str(self.title) if self.title else str(_("Untitled Document"))
 
     def save(self, *args, **kwargs):
-        """Write content to object storage only if _content has changed."""
-        super().save(*args, **kwargs)
+        """
+        Write content to object storage only if _content has changed. The digest of the
+        content is stored on the document so that detecting a change does not require a
+        request to object storage.
+        """
+        previous_cache_key = self.content_cache_key
+
+        with transaction.atomic():
+            has_changed = False
+            if self._content:
+                bytes_content = self._content.encode("utf-8")
+                content_hash = hashlib.md5(bytes_content).hexdigest()  # noqa: S324
+                has_changed = content_hash != self.get_stored_content_hash()
+                self.content_hash = content_hash
+                self.content_size = len(bytes_content)
+
+            if not self._state.adding and kwargs.get("update_fields") is None:
+                # The number of accesses is maintained by the accesses themselves and
+                # must not be overwritten by a value loaded before they changed
+                kwargs["update_fields"] = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name != "nb_accesses"
+                ]
+
+            super().save(*args, **kwargs)
+
+            if has_changed and settings.DOCUMENT_CONTENT_WRITE_BEHIND:
+                # Stage the content only if the transaction succeeds, it will be written
+                # to object storage by a celery task
+                transaction.on_commit(partial(self.stage_content, self._content))
+            elif has_changed:
+                # Writing to object storage inside the transaction guarantees that the
+                # digest stored in database never points to a content that was not written
+                self.write_content(bytes_content)
+            elif self._content:
+                metrics.increment_counter("document_content_writes_skipped")
 
         if self._content:
-            file_key = self.file_key
-            bytes_content = self._content.encode("utf-8")
+            # Invalidate the cached content and warm up the cache with the current one
+            cache_key = self.content_cache_key
+            if previous_cache_key and previous_cache_key != cache_key:
+                caches[settings.DOCUMENT_CONTENT_CACHE_ALIAS].delete(previous_cache_key)
+            cache_document_content(cache_key, self._content, self.content_size)
+
+    def get_stored_content_hash(self):
+        """
+        Return the digest of the content currently stored for the document and lock the
+        document row until the end of the transaction.
+
+        Documents saved before digests were stored in database fall back to comparing
+        with the ETag of the object in object storage.
+        """
+        if self._state.adding:
+            return None
 
-            # Attempt to directly check if the object exists using the storage client.
+        stored_hash = (
+            Document.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list("content_hash", flat=True)
+            .first()
+        )
+        if stored_hash != "":
+            # Either the digest or None if the document was deleted in the meantime
+            return stored_hash
+
+        # Attempt to directly check if the object exists using the storage client.
+        try:
+            response = default_storage.connection.meta.client.head_object(
+                Bucket=default_storage.bucket_name, Key=self.file_key
+            )
+        except ClientError as excpt:
+            # If the error is a 404, the object doesn't exist, so we should create it.
+            if excpt.response["Error"]["Code"] == "404":
+                return None
+            raise
+        return response["ETag"].strip('"')
+
+    def write_content(self, bytes_content):
+        """
+        Write the content of the document to object storage. When compression is
+        enabled, the object is gzipped and marked with a "gzip" content encoding.
+        """
+        if not settings.DOCUMENT_CONTENT_COMPRESSION:
+            default_storage.save(self.file_key, ContentFile(bytes_content))
+            return
+
+        default_storage.connection.meta.client.put_object(
+            Bucket=default_storage.bucket_name,
+            Key=self.file_key,
+            # Don't store a modification time so that equal contents compress equally
+            Body=gzip.compress(
+                bytes_content,
+                compresslevel=settings.DOCUMENT_CONTENT_COMPRESSION_LEVEL,
+                mtime=0,
+            ),
+            ContentEncoding="gzip",
+        )
+
+    def compress_stored_content(self):
+        """
+        Rewrite the content of the document compressed in object storage if it was
+        stored uncompressed. Return True if the content was rewritten.
+
+        The document row is locked so that the content can't be modified in the
+        meantime. Contents that don't match the digest stored in database are skipped
+        as a more recent content is waiting to be written behind.
+        """
+        with transaction.atomic():
+            stored_hash = (
+                Document.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list("content_hash", flat=True)
+                .first()
+            )
             try:
-                response = default_storage.connection.meta.client.head_object(
-                    Bucket=default_storage.bucket_name, Key=file_key
-                )
-            except ClientError as excpt:
-                # If the error is a 404, the object doesn't exist, so we should create it.
-                if excpt.response["Error"]["Code"] == "404":
-                    has_changed = True
-                else:
-                    raise
-            else:
-                # Compare the existing ETag with the MD5 hash of the new content.
-                has_changed = (
-                    response["ETag"].strip('"')
-                    != hashlib.md5(bytes_content).hexdigest()  # noqa: S324
+                response = self.get_content_response()
+            except (FileNotFoundError, ClientError):
+                return False
+
+            if response.get("ContentEncoding") == "gzip":
+                return False
+
+            bytes_content = response["Body"].read()
+            content_hash = hashlib.md5(bytes_content).hexdigest()  # noqa: S324
+            if stored_hash is None or stored_hash not in ("", content_hash):
+                return False
+
+            self.write_content(bytes_content)
+
+            # Documents saved before digests were stored in database get one for free
+            if not stored_hash:
+                Document.objects.filter(pk=self.pk).update(
+                    content_hash=content_hash, content_size=len(bytes_content)
                 )
+        return True
 
-            if has_changed:
-                content_file = ContentFile(bytes_content)
-                default_storage.save(file_key, content_file)
+    def stage_content(self, content):
+        """
+        Stage the content in the cache until a celery task writes it to object storage.
+        Saves of the document happening before the task runs are coalesced into one
+        write.
+        """
+        caches[settings.DOCUMENT_CONTENT_STAGING_CACHE_ALIAS].set(
+            self.get_staged_content_key(self.pk), content, timeout=None
+        )
+        self.schedule_content_flush()
+
+    def schedule_content_flush(self):
+        """
+        Schedule writing the staged content to object storage unless it is already
+        scheduled. The lock expires in case the task gets lost so that a later save can
+        schedule it again.
+        """
+        delay = settings.DOCUMENT_CONTENT_WRITE_BEHIND_DELAY
+        if caches[settings.DOCUMENT_CONTENT_STAGING_CACHE_ALIAS].add(
+            self.get_flush_lock_key(self.pk), True, timeout=delay + 60
+        ):
+            tasks.flush_document_content.apply_async((str(self.pk),), countdown=delay)
+
+    @staticmethod
+    def get_staged_content_key(document_id):
+        """Key under which the content of a document is staged until it is written."""
+        return f"document_content_staged_{document_id!s}"
+
+    @staticmethod
+    def get_flush_lock_key(document_id):
+        """Key set while writing the staged content of a document is scheduled."""
+        return f"document_content_flush_{document_id!s}"
 
     @property
     def key_base(self):
@@ -411,16 +618,48 @@ class Document(BaseModel):
         """Key of the object storage file to which the document content is stored"""
         return f"{self.key_base}/file"
 
+    @property
+    def content_cache_key(self):
+        """
+        Key under which the current content of the document is cached. It changes each
+        time the content of the document changes so that a reader can't cache stale
+        content. Documents saved before digests were stored in database are keyed on
+        their last update instead.
+        """
+        if not self.pk:
+            return None
+        if self.content_hash:
+            return f"document_content_{self.pk!s}_{self.content_hash:s}"
+        if self.updated_at:
+            return f"document_content_{self.pk!s}_{self.updated_at:%Y%m%d%H%M%S%f}"
+        return None
+
+    def get_version_cache_key(self, version_id):
+        """Key under which the content of a version of the document is cached."""
+        return f"document_content_{self.pk!s}_version_{version_id:s}"
+
     @property
     def content(self):
-        """Return the json content from object storage if available"""
+        """Return the json content from the cache or object storage if available"""
         if self._content is None and self.id:
-            try:
-                response = self.get_content_response()
-            except (FileNotFoundError, ClientError):
-                pass
-            else:
-                self._content = response["Body"].read().decode("utf-8")
+            if settings.DOCUMENT_CONTENT_WRITE_BEHIND:
+                self._content = caches[
+                    settings.DOCUMENT_CONTENT_STAGING_CACHE_ALIAS
+                ].get(self.get_staged_content_key(self.pk))
+
+            cache_key = self.content_cache_key
+            if self._content is None and cache_key:
+                self._content = caches[settings.DOCUMENT_CONTENT_CACHE_ALIAS].get(
+                    cache_key
+                )
+
+            if self._content is None:
+                try:
+                    response = self.get_content_response()
+                except (FileNotFoundError, ClientError):
+                    pass
+                else:
+                    self.set_stored_content(read_document_content(response))
         return self._content
 
     @content.setter
@@ -431,12 +670,125 @@ class Document(BaseModel):
 
         self._content = content
 
+    def set_stored_content(self, bytes_content):
+        """
+        Set the content as read from object storage and cache it, unless it does not
+        match the digest stored in database (the content was modified in the meantime).
+        """
+        self._content = bytes_content.decode("utf-8")
+
+        cache_key = self.content_cache_key
+        content_hash = hashlib.md5(bytes_content).hexdigest()  # noqa: S324
+        if cache_key and self.content_hash in ("", content_hash):
+            cache_document_content(cache_key, self._content, len(bytes_content))
+
     def get_content_response(self, version_id=""):
         """Get the content in a specific version of the document"""
         return default_storage.connection.meta.client.get_object(
             Bucket=default_storage.bucket_name, Key=self.file_key, VersionId=version_id
         )
 
+    def get_content_version(self, version_id):
+        """
+        Get the content and last modification date of a specific version of the document.
+        Versions are immutable so they are cached without further invalidation.
+        """
+        cache_key = self.get_version_cache_key(version_id)
+        version = caches[settings.DOCUMENT_CONTENT_CACHE_ALIAS].get(cache_key)
+
+        if version is None:
+            response = self.get_content_response(version_id=version_id)
+            bytes_content = read_document_content(response)
+            version = {
+                "content": bytes_content.decode("utf-8"),
+                "last_modified": response["LastModified"],
+            }
+            cache_document_content(cache_key, version, len(bytes_content))
+
+        return version
+
+    @classmethod
+    def repair_nb_accesses(cls, document_ids):
+        """
+        Recompute the number of accesses of a batch of documents from their accesses.
+        Return the number of documents of which the counter was out of sync.
+        """
+        nb_accesses = Coalesce(
+            models.Subquery(
+                DocumentAccess.objects.filter(document_id=models.OuterRef("pk"))
+                .order_by()
+                .values("document")
+                .annotate(count=models.Count("id"))
+                .values("count")
+            ),
+            0,
+        )
+        return (
+            cls.objects.filter(pk__in=document_ids)
+            .exclude(nb_accesses=nb_accesses)
+            .update(nb_accesses=nb_accesses)
+        )
+
+    @staticmethod
+    def prefetch_content(documents):
+        """
+        Fetch the content of a batch of documents concurrently on a bounded pool of
+        threads instead of issuing one blocking request per document. Contents are
+        looked up in the cache first and only the missing ones hit object storage.
+        """
+        documents = [document for document in documents if document.pk]
+        if not documents:
+            return
+
+        staged_contents = {}
+        if settings.DOCUMENT_CONTENT_WRITE_BEHIND:
+            staged_contents = caches[
+                settings.DOCUMENT_CONTENT_STAGING_CACHE_ALIAS
+            ].get_many(
+                [Document.get_staged_content_key(document.pk) for document in documents]
+            )
+
+        content_cache = caches[settings.DOCUMENT_CONTENT_CACHE_ALIAS]
+        cache_keys = {document.pk: document.content_cache_key for document in documents}
+        cached_contents = content_cache.get_many(
+            [key for key in cache_keys.values() if key]
+        )
+
+        missing_documents = []
+        for document in documents:
+            content = staged_contents.get(
+                Document.get_staged_content_key(document.pk),
+                cached_contents.get(cache_keys[document.pk]),
+            )
+            if content is None:
+                missing_documents.append(document)
+            else:
+                document.content = content
+
+        documents = missing_documents
+        if not documents:
+            return
+
+        # The storage connection is thread-local but boto3 clients are thread-safe:
+        # resolve the client once and share it with all the workers.
+        client = default_storage.connection.meta.client
+        bucket_name = default_storage.bucket_name
+
+        def fetch(document):
+            try:
+                response = client.get_object(Bucket=bucket_name, Key=document.file_key)
+            except (FileNotFoundError, ClientError):
+                return None
+            return read_document_content(response)
+
+        max_workers = min(len(documents), settings.DOCUMENT_CONTENT_FETCH_MAX_WORKERS)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for document, bytes_content in zip(
+                documents, executor.map(fetch, documents), strict=True
+            ):
+                if bytes_content is not None:
+                    document.set_stored_content(bytes_content)
+
     def get_versions_slice(self, from_version_id="", min_datetime=None, page_size=None):
         """Get document versions from object storage with pagination and starting conditions"""
         # /!\ Trick here /!\
@@ -497,6 +849,9 @@ class Document(BaseModel):
 
     def delete_version(self, version_id):
         """Delete a version from object storage given its version id"""
+        caches[settings.DOCUMENT_CONTENT_CACHE_ALIAS].delete(
+            self.get_version_cache_key(version_id)
+        )
         return default_storage.connection.meta.client.delete_object(
             Bucket=default_storage.bucket_name, Key=self.file_key, VersionId=version_id
         )
@@ -705,6 +1060,17 @@ class DocumentAccess(BaseAccess):
     def __str__(self):
         return f"{self.user!s} is {self.role:s} in document {self.document!s}"
 
+    def save(self, *args, **kwargs):
+        """Increment the number of accesses of the document in the same transaction."""
+        with transaction.atomic():
+            is_adding = self._state.adding
+            super().save(*args, **kwargs)
+
+            if is_adding:
+                Document.objects.filter(pk=self.document_id).update(
+                    nb_accesses=models.F("nb_accesses") + 1
+                )
+
     def get_abilities(self, user):
         """
         Compute and return abilities for a given user on the document access.
@@ -712,6 +1078,129 @@ class DocumentAccess(BaseAccess):
         return self._get_abilities(self.document, user)
 
 
+class UserDocument(BaseModel):
+    """
+    Denormalized index of the documents related to each user, kept in sync with
+    document accesses, link traces, favorites and the link reach of documents. It lets
+    the list endpoint find the documents visible to a user with an indexed lookup and
+    precomputes the direct role of the user and their favorite flag.
+
+    Accesses given to teams are not indexed as team memberships are not stored in
+    database.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="user_documents"
+    )
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name="user_documents"
+    )
+    role = models.CharField(max_length=20, choices=RoleChoices.choices, blank=True)
+    has_link_trace = models.BooleanField(default=False)
+    is_favorite = models.BooleanField(default=False)
+    is_visible = models.BooleanField(
+        default=False,
+        help_text=_(
+            "Whether the document is listed for the user: the user has a role on it or "
+            "visited it while its link reach was not restricted."
+        ),
+    )
+
+    class Meta:
+        db_table = "impress_user_document"
+        verbose_name = _("User/document visibility")
+        verbose_name_plural = _("User/document visibilities")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "document"], name="unique_user_document"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user!s} relation to document {self.document!s}"
+
+    @classmethod
+    def sync(cls, user_id, document_ids):
+        """
+        Recompute the rows of a user and a batch of documents from the tables they
+        denormalize, in a constant number of queries. Rows are removed when the user
+        is not related to the document anymore.
+        """
+        relations = (
+            Document.objects.filter(pk__in=document_ids)
+            .annotate(
+                role=models.Subquery(
+                    DocumentAccess.objects.filter(
+                        document_id=models.OuterRef("pk"), user_id=user_id
+                    ).values("role")[:1]
+                ),
+                has_link_trace=models.Exists(
+                    LinkTrace.objects.filter(
+                        document_id=models.OuterRef("pk"), user_id=user_id
+                    )
+                ),
+                is_favorite=models.Exists(
+                    DocumentFavorite.objects.filter(
+                        document_id=models.OuterRef("pk"), user_id=user_id
+                    )
+                ),
+            )
+            .values("pk", "link_reach", "role", "has_link_trace", "is_favorite")
+        )
+
+        user_documents = [
+            cls(
+                user_id=user_id,
+                document_id=relation["pk"],
+                role=relation["role"] or "",
+                has_link_trace=relation["has_link_trace"],
+                is_favorite=relation["is_favorite"],
+                is_visible=bool(relation["role"])
+                or (
+                    relation["has_link_trace"]
+                    and relation["link_reach"] != LinkReachChoices.RESTRICTED
+                ),
+            )
+            for relation in relations
+            if relation["role"] or relation["has_link_trace"] or relation["is_favorite"]
+        ]
+
+        related_document_ids = [
+            user_document.document_id for user_document in user_documents
+        ]
+        if len(related_document_ids) < len(document_ids):
+            cls.objects.filter(user_id=user_id, document_id__in=document_ids).exclude(
+                document_id__in=related_document_ids
+            ).delete()
+
+        if user_documents:
+            cls.objects.bulk_create(
+                user_documents,
+                update_conflicts=True,
+                unique_fields=["user", "document"],
+                update_fields=[
+                    "role",
+                    "has_link_trace",
+                    "is_favorite",
+                    "is_visible",
+                    "updated_at",
+                ],
+            )
+
+    @classmethod
+    def sync_link_reach(cls, document_id, link_reach):
+        """
+        Update the visibility of a document for users who only visited it via its link
+        after its link reach changed.
+        """
+        is_visible = link_reach != LinkReachChoices.RESTRICTED
+        cls.objects.filter(
+            document_id=document_id, role="", has_link_trace=True
+        ).exclude(is_visible=is_visible).update(
+            is_visible=is_visible, updated_at=timezone.now()
+        )
+
+
 class Template(BaseModel):
     """HTML and CSS code used for formatting the print around the MarkDown body."""
 
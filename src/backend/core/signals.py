@@ -0,0 +1,58 @@
+"""Signal receivers of the impress core application."""
+
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import models
+
+
+def is_cascading_from(origin, *model_classes):
+    """Check if a deletion was triggered by the deletion of one of the given models."""
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, model_classes)
+    return isinstance(origin, model_classes)
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=models.DocumentAccess)
+@receiver(post_save, sender=models.LinkTrace)
+@receiver(post_save, sender=models.DocumentFavorite)
+def sync_user_document_on_save(sender, instance, **kwargs):
+    """Index the relation of a user to a document when it is created or updated."""
+    if instance.user_id:
+        models.UserDocument.sync(instance.user_id, [instance.document_id])
+
+
+# pylint: disable=unused-argument
+@receiver(post_delete, sender=models.DocumentAccess)
+@receiver(post_delete, sender=models.LinkTrace)
+@receiver(post_delete, sender=models.DocumentFavorite)
+def sync_user_document_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Update the index when the relation of a user to a document is deleted, unless the
+    user or the document themselves are being deleted: their rows are deleted in cascade.
+    """
+    if instance.user_id and not is_cascading_from(origin, models.Document, models.User):
+        models.UserDocument.sync(instance.user_id, [instance.document_id])
+
+
+# pylint: disable=unused-argument
+@receiver(post_delete, sender=models.DocumentAccess)
+def decrement_nb_accesses(sender, instance, origin=None, **kwargs):
+    """
+    Decrement the number of accesses of the document, unless the document itself is
+    being deleted. Receivers are called in the transaction of the deletion.
+    """
+    if not is_cascading_from(origin, models.Document):
+        models.Document.objects.filter(pk=instance.document_id).update(
+            nb_accesses=F("nb_accesses") - 1
+        )
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=models.Document)
+def sync_user_documents_link_reach(sender, instance, created, **kwargs):
+    """Update the visibility of a document for its visitors when its link reach changes."""
+    if not created:
+        models.UserDocument.sync_link_reach(instance.pk, instance.link_reach)
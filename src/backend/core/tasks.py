@@ -0,0 +1,54 @@
+"""Celery tasks of the impress core application."""
+
+from logging import getLogger
+
+from django.conf import settings
+from django.core.cache import caches
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from core import models
+
+from impress.celery_app import app
+
+logger = getLogger(__name__)
+
+# Time during which a staged content is kept once it was written to object storage
+FLUSHED_CONTENT_TIMEOUT = 5 * 60
+
+
+@app.task(
+    autoretry_for=(BotoCoreError, ClientError),
+    retry_backoff=True,
+    max_retries=5,
+)
+def flush_document_content(document_id):
+    """Write the content staged for a document to object storage."""
+    staging_cache = caches[settings.DOCUMENT_CONTENT_STAGING_CACHE_ALIAS]
+    staged_content_key = models.Document.get_staged_content_key(document_id)
+
+    # Saves happening from now on must schedule a new flush
+    staging_cache.delete(models.Document.get_flush_lock_key(document_id))
+
+    content = staging_cache.get(staged_content_key)
+    if content is None:
+        return
+
+    try:
+        document = models.Document.objects.get(pk=document_id)
+    except models.Document.DoesNotExist:
+        logger.info(
+            "Document %s was deleted before its content was flushed", document_id
+        )
+        staging_cache.delete(staged_content_key)
+        return
+
+    document.write_content(content.encode("utf-8"))
+
+    if staging_cache.get(staged_content_key) == content:
+        # Readers can now get the content from object storage
+        staging_cache.touch(staged_content_key, FLUSHED_CONTENT_TIMEOUT)
+    else:
+        # The document was saved while we were writing: make sure its latest content
+        # is written last even if our write completed after a concurrent flush.
+        document.schedule_content_flush()
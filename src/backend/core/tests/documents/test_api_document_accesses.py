@@ -131,6 +131,29 @@ def test_api_document_accesses_list_authenticated_related(via, mock_user_teams):
     )
 
 
+def test_api_document_accesses_list_cursor_pagination():
+    """Document accesses should be listable by keyset pagination following the next links."""
+    user = factories.UserFactory()
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    factories.UserDocumentAccessFactory.create_batch(4, document=document)
+
+    client = APIClient()
+    client.force_login(user)
+
+    ids = []
+    url = f"/api/v1.0/documents/{document.id!s}/accesses/?cursor=&page_size=2"
+    while url:
+        response = client.get(url)
+
+        assert response.status_code == 200
+        assert "count" not in response.json()
+        ids.extend(result["id"] for result in response.json()["results"])
+        url = response.json()["next"]
+
+    assert len(ids) == 5
+    assert set(ids) == {str(access.id) for access in document.accesses.all()}
+
+
 def test_api_document_accesses_retrieve_anonymous():
     """
     Anonymous users should not be allowed to retrieve a document access.
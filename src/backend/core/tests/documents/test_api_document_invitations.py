@@ -129,6 +129,31 @@ def test_api_document_invitations_list_authenticated_unprivileged(
     assert response.json()["count"] == 0
 
 
+def test_api_document_invitations_list_cursor_pagination():
+    """Invitations should be listable by keyset pagination following the next links."""
+    user = factories.UserFactory()
+    document = factories.DocumentFactory(users=[(user, "owner")])
+    invitations = factories.InvitationFactory.create_batch(
+        5, document=document, issuer=user
+    )
+
+    client = APIClient()
+    client.force_login(user)
+
+    ids = []
+    url = f"/api/v1.0/documents/{document.id!s}/invitations/?cursor=&page_size=2"
+    while url:
+        response = client.get(url)
+
+        assert response.status_code == 200
+        assert "count" not in response.json()
+        ids.extend(result["id"] for result in response.json()["results"])
+        url = response.json()["next"]
+
+    assert len(ids) == 5
+    assert set(ids) == {str(invitation.id) for invitation in invitations}
+
+
 def test_api_document_invitations_list_expired_invitations_still_listed():
     """
     Expired invitations are still listed.
@@ -74,6 +74,78 @@ def test_api_documents_list_format():
     }
 
 
+def test_api_documents_list_without_content():
+    """
+    The content of documents should be omitted from the list view and not fetched from
+    object storage when the "with_content" option is set to false.
+    """
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    factories.DocumentFactory.create_batch(2, users=[user])
+
+    with mock.patch.object(models.Document, "prefetch_content") as mock_prefetch:
+        response = client.get("/api/v1.0/documents/?with_content=false")
+
+    mock_prefetch.assert_not_called()
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 2
+    for result in results:
+        assert "content" not in result
+        assert "title" in result
+
+
+def test_api_documents_list_with_content_invalid():
+    """The "with_content" option should be a boolean."""
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    response = client.get("/api/v1.0/documents/?with_content=invalid")
+
+    assert response.status_code == 400
+    assert response.json() == {"with_content": ["Must be a valid boolean."]}
+
+
+def test_api_documents_list_prefetch_content():
+    """
+    The content of all the documents of a page should be fetched in one batch and not
+    one document after the other while serializing.
+    """
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    documents = factories.DocumentFactory.create_batch(3, users=[user])
+    expected_contents = {str(document.id): document.content for document in documents}
+
+    with (
+        mock.patch.object(
+            models.Document,
+            "prefetch_content",
+            side_effect=models.Document.prefetch_content,
+        ) as mock_prefetch,
+        mock.patch.object(
+            models.Document, "get_content_response"
+        ) as mock_get_content_response,
+    ):
+        response = client.get("/api/v1.0/documents/")
+
+    assert response.status_code == 200
+    mock_prefetch.assert_called_once()
+    mock_get_content_response.assert_not_called()
+
+    results = response.json()["results"]
+    assert {result["id"]: result["content"] for result in results} == (
+        expected_contents
+    )
+
+
 def test_api_documents_list_authenticated_direct(django_assert_num_queries):
     """
     Authenticated users should be able to list documents they are a direct
@@ -107,6 +179,36 @@ def test_api_documents_list_authenticated_direct(django_assert_num_queries):
     assert expected_ids == results_id
 
 
+def test_api_documents_list_authenticated_visibility_index(django_assert_num_queries):
+    """
+    Users who are not in any team should get their documents from the visibility
+    index, without having to join and deduplicate accesses and link traces.
+    """
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    access = factories.UserDocumentAccessFactory(user=user, role="editor")
+    factories.UserDocumentAccessFactory.create_batch(2, document=access.document)
+    models.DocumentFavorite.objects.create(document=access.document, user=user)
+
+    with django_assert_num_queries(3) as captured:
+        response = client.get("/api/v1.0/documents/")
+
+    documents_query = captured.captured_queries[-1]["sql"]
+    assert "impress_user_document" in documents_query
+    assert "DISTINCT" not in documents_query
+
+    assert response.status_code == 200
+    (result,) = response.json()["results"]
+    assert result["id"] == str(access.document.id)
+    assert result["is_favorite"] is True
+    assert result["nb_accesses"] == 3
+    assert result["abilities"] == access.document.get_abilities(user)
+    assert result["abilities"]["update"] is True
+
+
 def test_api_documents_list_authenticated_via_team(
     django_assert_num_queries, mock_user_teams
 ):
@@ -253,6 +355,61 @@ def test_api_documents_list_pagination(
     assert document_ids == []
 
 
+@pytest.mark.parametrize("ordering", ["title", "-title", "-updated_at"])
+def test_api_documents_list_cursor_pagination(ordering, django_assert_num_queries):
+    """
+    Keyset pagination should return each document exactly once, in order and without
+    a count query, even when the values of the ordering field are duplicated or null.
+    """
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    # The document factory gets documents by title so titles are set afterwards
+    for title in ["b", "a", "b", None, "c", None, "b"]:
+        document = factories.DocumentFactory(users=[user])
+        models.Document.objects.filter(pk=document.pk).update(title=title)
+
+    expected_ids = [
+        str(document.id)
+        for document in models.Document.objects.filter(
+            user_documents__user=user
+        ).order_by(ordering, "-pk" if ordering.startswith("-") else "pk")
+    ]
+
+    ids = []
+    url = f"/api/v1.0/documents/?cursor=&page_size=2&ordering={ordering:s}"
+    while url:
+        with django_assert_num_queries(2):
+            response = client.get(url)
+
+        assert response.status_code == 200
+        content = response.json()
+        assert "count" not in content
+        assert len(content["results"]) <= 2
+        ids.extend(result["id"] for result in content["results"])
+        url = content["next"]
+
+    assert ids == expected_ids
+
+
+@pytest.mark.parametrize("cursor", ["invalid", "W10=", "WyJub3QgYSBkYXRlIiwgMV0="])
+def test_api_documents_list_cursor_pagination_invalid(cursor):
+    """Invalid cursors should return a 404."""
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    factories.DocumentFactory(users=[user])
+
+    response = client.get(f"/api/v1.0/documents/?cursor={cursor:s}")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
 def test_api_documents_list_authenticated_distinct():
     """A document with several related users should only be listed once."""
     user = factories.UserFactory()
@@ -166,6 +166,34 @@ def test_api_templates_list_authenticated_distinct():
     assert content["results"][0]["id"] == str(template.id)
 
 
+def test_api_templates_list_num_queries(django_assert_num_queries):
+    """
+    Accesses serialized with each template and their abilities should not cost
+    queries per template or per access.
+    """
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    for _i in range(3):
+        template = factories.TemplateFactory(users=[(user, "owner")])
+        factories.UserTemplateAccessFactory(template=template, role="owner")
+        factories.UserTemplateAccessFactory(template=template)
+        factories.TeamTemplateAccessFactory(template=template)
+
+    with django_assert_num_queries(4):
+        response = client.get("/api/v1.0/templates/")
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 3
+    for result in results:
+        assert len(result["accesses"]) == 4
+        for access in result["accesses"]:
+            assert access["abilities"]["destroy"] is True
+
+
 def test_api_templates_list_order_default():
     """The templates list should be sorted by 'created_at' in descending order by default."""
     user = factories.UserFactory()
@@ -520,3 +520,21 @@ def test_api_templates_retrieve_authenticated_related_team_owners(
         "code": template.code,
         "css": template.css,
     }
+
+
+def test_api_templates_retrieve_num_queries(django_assert_num_queries):
+    """Abilities of the accesses of a template should not cost a query per access."""
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    template = factories.TemplateFactory(users=[(user, "owner")])
+    factories.UserTemplateAccessFactory.create_batch(3, template=template)
+    factories.UserTemplateAccessFactory(template=template, role="owner")
+
+    with django_assert_num_queries(3):
+        response = client.get(f"/api/v1.0/templates/{template.id!s}/")
+
+    assert response.status_code == 200
+    assert len(response.json()["accesses"]) == 5
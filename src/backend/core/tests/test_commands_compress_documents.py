@@ -0,0 +1,57 @@
+"""Test the `compress_documents` management command"""
+
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+import pytest
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def test_commands_compress_documents_disabled(settings):
+    """The command should refuse to run while compression is disabled."""
+    settings.DOCUMENT_CONTENT_COMPRESSION = False
+
+    with pytest.raises(CommandError, match="Compression is disabled"):
+        call_command("compress_documents")
+
+
+def test_commands_compress_documents(settings):
+    """Only documents stored uncompressed should be rewritten compressed."""
+    documents = factories.DocumentFactory.create_batch(2)
+    settings.DOCUMENT_CONTENT_COMPRESSION = True
+    compressed_document = factories.DocumentFactory()
+
+    # Documents saved before digests were stored in database should get one
+    models.Document.objects.filter(pk=documents[0].pk).update(
+        content_hash="", content_size=None
+    )
+
+    stdout = StringIO()
+    call_command("compress_documents", stdout=stdout)
+
+    assert stdout.getvalue() == "2 document(s) compressed.\n"
+    for document in [*documents, compressed_document]:
+        response = document.get_content_response()
+        assert response["ContentEncoding"] == "gzip"
+        assert models.read_document_content(response) == document.content.encode()
+
+    documents[0].refresh_from_db()
+    assert documents[0].content_hash != ""
+    assert documents[0].content_size == len(documents[0].content)
+
+
+def test_commands_compress_documents_dry_run(settings):
+    """In dry run mode, the command should only count documents to compress."""
+    document = factories.DocumentFactory()
+    settings.DOCUMENT_CONTENT_COMPRESSION = True
+    factories.DocumentFactory()
+
+    stdout = StringIO()
+    call_command("compress_documents", "--dry-run", stdout=stdout)
+
+    assert stdout.getvalue() == "1 document(s) to compress.\n"
+    assert "ContentEncoding" not in document.get_content_response()
@@ -0,0 +1,30 @@
+"""Test the `repair_nb_accesses` management command"""
+
+from io import StringIO
+
+from django.core.management import call_command
+
+import pytest
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def test_commands_repair_nb_accesses():
+    """Only documents of which the number of accesses is out of sync should be repaired."""
+    documents = factories.DocumentFactory.create_batch(3)
+    factories.UserDocumentAccessFactory.create_batch(2, document=documents[0])
+    factories.UserDocumentAccessFactory(document=documents[1])
+
+    models.Document.objects.filter(pk=documents[0].pk).update(nb_accesses=0)
+    models.Document.objects.filter(pk=documents[2].pk).update(nb_accesses=4)
+
+    stdout = StringIO()
+    call_command("repair_nb_accesses", batch_size=2, stdout=stdout)
+
+    assert stdout.getvalue() == "2 document(s) repaired.\n"
+    assert [
+        models.Document.objects.get(pk=document.pk).nb_accesses
+        for document in documents
+    ] == [2, 1, 0]
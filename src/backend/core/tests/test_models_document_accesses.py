@@ -7,7 +7,7 @@ from django.core.exceptions import ValidationError
 
 import pytest
 
-from core import factories
+from core import factories, models
 
 pytestmark = pytest.mark.django_db
 
@@ -80,6 +80,44 @@ def test_models_document_accesses_user_and_team_empty():
 # get_abilities
 
 
+def test_models_document_accesses_nb_accesses():
+    """The number of accesses of a document should follow the creation of its accesses."""
+    document = factories.DocumentFactory()
+    factories.UserDocumentAccessFactory(document=document)
+    factories.TeamDocumentAccessFactory(document=document)
+    access = factories.UserDocumentAccessFactory(document=document)
+
+    # Updating an access does not change the number of accesses
+    access.role = "owner"
+    access.save()
+
+    document.refresh_from_db()
+    assert document.nb_accesses == 3
+
+    access.delete()
+    document.refresh_from_db()
+    assert document.nb_accesses == 2
+
+    # Deleting a user deletes their accesses
+    factories.UserDocumentAccessFactory(document=document).user.delete()
+    document.refresh_from_db()
+    assert document.nb_accesses == 2
+
+
+def test_models_document_accesses_nb_accesses_stale_document():
+    """Saving a document loaded before its accesses changed should keep the counter."""
+    document = factories.DocumentFactory()
+    stale_document = models.Document.objects.get(pk=document.pk)
+    factories.UserDocumentAccessFactory.create_batch(2, document=document)
+
+    stale_document.title = "new title"
+    stale_document.save()
+
+    document.refresh_from_db()
+    assert document.title == "new title"
+    assert document.nb_accesses == 2
+
+
 def test_models_document_access_get_abilities_anonymous():
     """Check abilities returned for an anonymous user."""
     access = factories.UserDocumentAccessFactory()
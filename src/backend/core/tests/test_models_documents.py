@@ -8,13 +8,15 @@ from unittest import mock
 
 from django.contrib.auth.models import AnonymousUser
 from django.core import mail
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.files.storage import default_storage
+from django.db import transaction
 from django.utils import timezone
 
 import pytest
 
-from core import factories, models
+from core import factories, metrics, models, tasks
 
 pytestmark = pytest.mark.django_db
 
@@ -67,6 +69,125 @@ def test_models_documents_file_key():
     assert document.file_key == "9531a5f1-42b1-496c-b3f4-1c09ed139b3c/file"
 
 
+def test_models_documents_prefetch_content():
+    """
+    The "prefetch_content" method should load the content of a batch of documents
+    from object storage.
+    """
+    documents = factories.DocumentFactory.create_batch(3)
+    expected_contents = [document.content for document in documents]
+
+    # Get fresh instances from the database
+    documents = [models.Document.objects.get(pk=document.pk) for document in documents]
+
+    models.Document.prefetch_content(documents)
+
+    with mock.patch.object(
+        models.Document, "get_content_response"
+    ) as mock_get_content_response:
+        assert [document.content for document in documents] == expected_contents
+
+    mock_get_content_response.assert_not_called()
+
+
+def test_models_documents_prefetch_content_missing_file():
+    """
+    The "prefetch_content" method should ignore documents for which no file exists in
+    object storage.
+    """
+    document = models.Document.objects.create(title="no content")
+
+    models.Document.prefetch_content([document])
+
+    assert document.content is None
+
+
+# content cache
+
+
+def test_models_documents_content_cache():
+    """The content of a document should be served from the cache once it was read."""
+    document = factories.DocumentFactory()
+    cache.clear()
+
+    fresh_document = models.Document.objects.get(pk=document.pk)
+    assert fresh_document.content == document.content
+    assert cache.get(fresh_document.content_cache_key) == document.content
+
+    fresh_document = models.Document.objects.get(pk=document.pk)
+    with mock.patch.object(
+        models.Document, "get_content_response"
+    ) as mock_get_content_response:
+        assert fresh_document.content == document.content
+
+    mock_get_content_response.assert_not_called()
+
+
+def test_models_documents_content_cache_invalidated_on_save():
+    """Saving a document should invalidate its cached content."""
+    document = factories.DocumentFactory(content="initial")
+    previous_cache_key = document.content_cache_key
+    assert cache.get(previous_cache_key) == "initial"
+
+    document.content = "updated"
+    document.save()
+
+    assert document.content_cache_key != previous_cache_key
+    assert cache.get(previous_cache_key) is None
+    assert cache.get(document.content_cache_key) == "updated"
+    assert models.Document.objects.get(pk=document.pk).content == "updated"
+
+
+def test_models_documents_content_cache_max_size(settings):
+    """Contents bigger than the maximum size should not be cached."""
+    settings.DOCUMENT_CONTENT_CACHE_MAX_SIZE = 10
+
+    document = factories.DocumentFactory(content="a" * 11)
+    assert cache.get(document.content_cache_key) is None
+
+    document.content = "a" * 10
+    document.save()
+    assert cache.get(document.content_cache_key) == "a" * 10
+
+
+def test_models_documents_content_cache_timeout(settings):
+    """Contents bigger than the size threshold should be cached for a shorter time."""
+    settings.DOCUMENT_CONTENT_CACHE_TIMEOUT = 1000
+    settings.DOCUMENT_CONTENT_CACHE_SIZE_THRESHOLD = 10
+
+    with mock.patch.object(cache, "set") as mock_set:
+        models.cache_document_content("small", "a" * 10, 10)
+        models.cache_document_content("big", "a" * 40, 40)
+
+    assert mock_set.call_args_list == [
+        mock.call("small", "a" * 10, 1000),
+        mock.call("big", "a" * 40, 250),
+    ]
+
+
+def test_models_documents_get_content_version_cache():
+    """Versions of a document should be cached once read."""
+    document = factories.DocumentFactory(content="initial")
+    document.content = "updated"
+    document.save()
+
+    version_id = document.get_versions_slice()["versions"][0]["version_id"]
+
+    version = document.get_content_version(version_id)
+    assert version["content"] == "initial"
+
+    with mock.patch.object(
+        models.Document, "get_content_response"
+    ) as mock_get_content_response:
+        assert document.get_content_version(version_id) == version
+
+    mock_get_content_response.assert_not_called()
+
+    # Deleting the version should invalidate the cache
+    document.delete_version(version_id)
+    assert cache.get(document.get_version_cache_key(version_id)) is None
+
+
 # get_abilities
 
 
@@ -417,6 +538,230 @@ def test_models_documents_version_duplicate():
     assert len(response["Versions"]) == 2
 
 
+def test_models_documents_content_hash_and_size():
+    """The digest and size of the content should be stored on the document."""
+    document = factories.DocumentFactory(content="foo")
+
+    document.refresh_from_db()
+    assert document.content_hash == "acbd18db4cc2f85cedef654fccc4a4d8"
+    assert document.content_size == 3
+
+    document.content = "héllo"
+    document.save()
+
+    document.refresh_from_db()
+    assert document.content_hash == "be50e8478cf24ff3595bc7307fb91b50"
+    assert document.content_size == 6
+
+
+def test_models_documents_save_unchanged_content_no_storage_request():
+    """
+    Saving a document without changing its content should not make any request to
+    object storage and should be counted as a skipped write.
+    """
+    document = factories.DocumentFactory()
+    client = default_storage.connection.meta.client
+    skipped_writes = metrics.get_counter("document_content_writes_skipped")
+
+    document = models.Document.objects.get(pk=document.pk)
+    document.content = document.content
+    document.title = "new title"
+
+    with (
+        mock.patch.object(client, "head_object") as mock_head_object,
+        mock.patch.object(default_storage, "save") as mock_save,
+    ):
+        document.save()
+
+    mock_head_object.assert_not_called()
+    mock_save.assert_not_called()
+    assert metrics.get_counter("document_content_writes_skipped") == skipped_writes + 1
+
+
+def test_models_documents_save_legacy_document_without_content_hash():
+    """
+    Documents saved before the digest of their content was stored in database should
+    fall back to comparing the content with the ETag of the object in object storage.
+    """
+    document = factories.DocumentFactory()
+    models.Document.objects.filter(pk=document.pk).update(
+        content_hash="", content_size=None
+    )
+
+    document = models.Document.objects.get(pk=document.pk)
+    document.content = document.content
+    client = default_storage.connection.meta.client
+
+    with (
+        mock.patch.object(
+            client, "head_object", wraps=client.head_object
+        ) as mock_head_object,
+        mock.patch.object(default_storage, "save") as mock_save,
+    ):
+        document.save()
+
+    mock_head_object.assert_called_once()
+    mock_save.assert_not_called()
+
+    document.refresh_from_db()
+    assert document.content_hash != ""
+
+
+def test_models_documents_write_behind(settings, django_capture_on_commit_callbacks):
+    """
+    With write-behind enabled, the content should be staged in the cache when the
+    transaction is committed and written to object storage later by a celery task.
+    """
+    document = factories.DocumentFactory(content="initial")
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+
+    document.content = "updated"
+    with (
+        mock.patch.object(default_storage, "save") as mock_save,
+        mock.patch.object(
+            tasks.flush_document_content, "apply_async"
+        ) as mock_apply_async,
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        document.save()
+
+    mock_save.assert_not_called()
+    mock_apply_async.assert_called_once_with((str(document.pk),), countdown=2)
+    staged_content_key = models.Document.get_staged_content_key(document.pk)
+    assert cache.get(staged_content_key) == "updated"
+
+    # Reads should see the staged content even if it is not in the content cache
+    cache.delete(document.content_cache_key)
+    assert models.Document.objects.get(pk=document.pk).content == "updated"
+    with default_storage.open(document.file_key) as file:
+        assert file.read() == b"initial"
+
+    tasks.flush_document_content(str(document.pk))
+
+    with default_storage.open(document.file_key) as file:
+        assert file.read() == b"updated"
+    assert cache.get(models.Document.get_flush_lock_key(document.pk)) is None
+
+
+def test_models_documents_write_behind_coalesce_saves(
+    settings, django_capture_on_commit_callbacks
+):
+    """Saves happening before the content is flushed should result in one write."""
+    document = factories.DocumentFactory(content="initial")
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+
+    with mock.patch.object(
+        tasks.flush_document_content, "apply_async"
+    ) as mock_apply_async:
+        for content in ["first", "second", "third"]:
+            document.content = content
+            with django_capture_on_commit_callbacks(execute=True):
+                document.save()
+
+    mock_apply_async.assert_called_once()
+
+    with mock.patch.object(
+        default_storage, "save", wraps=default_storage.save
+    ) as mock_save:
+        tasks.flush_document_content(str(document.pk))
+
+    mock_save.assert_called_once()
+    with default_storage.open(document.file_key) as file:
+        assert file.read() == b"third"
+
+
+def test_models_documents_write_behind_rollback(
+    settings, django_capture_on_commit_callbacks
+):
+    """Content should not be staged if the transaction is rolled back."""
+    document = factories.DocumentFactory(content="initial")
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+
+    document.content = "updated"
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        with pytest.raises(RuntimeError), transaction.atomic():
+            document.save()
+            raise RuntimeError
+
+    assert callbacks == []
+    assert cache.get(models.Document.get_staged_content_key(document.pk)) is None
+
+
+def test_models_documents_write_behind_prefetch_content(settings):
+    """Prefetching contents should give precedence to staged contents."""
+    documents = factories.DocumentFactory.create_batch(2)
+    settings.DOCUMENT_CONTENT_WRITE_BEHIND = True
+    cache.set(models.Document.get_staged_content_key(documents[0].pk), "staged")
+
+    fresh_documents = list(
+        models.Document.objects.filter(pk__in=[d.pk for d in documents]).order_by(
+            "created_at"
+        )
+    )
+    models.Document.prefetch_content(fresh_documents)
+
+    assert fresh_documents[0].content == "staged"
+    assert fresh_documents[1].content == documents[1].content
+
+
+def test_models_documents_content_compression(settings):
+    """
+    With compression enabled, contents should be stored gzipped in object storage and
+    transparently decompressed when read.
+    """
+    settings.DOCUMENT_CONTENT_COMPRESSION = True
+    document = factories.DocumentFactory(content="a" * 1000)
+
+    response = default_storage.connection.meta.client.head_object(
+        Bucket=default_storage.bucket_name, Key=document.file_key
+    )
+    assert response["ContentEncoding"] == "gzip"
+    assert response["ContentLength"] < 100
+
+    cache.clear()
+    assert models.Document.objects.get(pk=document.pk).content == "a" * 1000
+
+    cache.clear()
+    fresh_document = models.Document.objects.get(pk=document.pk)
+    models.Document.prefetch_content([fresh_document])
+    assert fresh_document.content == "a" * 1000
+
+
+def test_models_documents_content_compression_uncompressed_object(settings):
+    """Contents stored before compression was enabled should remain readable."""
+    document = factories.DocumentFactory(content="uncompressed")
+    settings.DOCUMENT_CONTENT_COMPRESSION = True
+
+    cache.clear()
+    assert models.Document.objects.get(pk=document.pk).content == "uncompressed"
+
+
+def test_models_documents_compress_stored_content(settings):
+    """Contents stored uncompressed should be rewritten compressed only once."""
+    document = factories.DocumentFactory(content="foo")
+    settings.DOCUMENT_CONTENT_COMPRESSION = True
+
+    assert document.compress_stored_content() is True
+    assert document.compress_stored_content() is False
+
+    response = document.get_content_response()
+    assert response["ContentEncoding"] == "gzip"
+    assert models.read_document_content(response) == b"foo"
+
+
+def test_models_documents_compress_stored_content_stale(settings):
+    """
+    Contents that don't match the digest stored in database should not be rewritten
+    as a more recent content is waiting to be written behind.
+    """
+    document = factories.DocumentFactory(content="foo")
+    settings.DOCUMENT_CONTENT_COMPRESSION = True
+    models.Document.objects.filter(pk=document.pk).update(content_hash="other")
+
+    assert document.compress_stored_content() is False
+    assert "ContentEncoding" not in document.get_content_response()
+
+
 def test_models_documents__email_invitation__success():
     """
     The email invitation is sent successfully.
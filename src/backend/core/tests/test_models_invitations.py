@@ -113,6 +113,15 @@ def test_models_invitationd_new_userd_convert_invitations_to_accesses():
         document=invitation_to_document2.document, email=other_invitation.email
     ).exists()  # the other invitation remains
 
+    for invitation in [invitation_to_document1, invitation_to_document2]:
+        invitation.document.refresh_from_db()
+        assert (
+            invitation.document.nb_accesses
+            == models.DocumentAccess.objects.filter(
+                document=invitation.document
+            ).count()
+        )
+
 
 def test_models_invitationd_new_user_filter_expired_invitations():
     """
@@ -144,7 +153,7 @@ def test_models_invitationd_new_user_filter_expired_invitations():
     ).exists()
 
 
-@pytest.mark.parametrize("num_invitations, num_queries", [(0, 3), (1, 7), (20, 7)])
+@pytest.mark.parametrize("num_invitations, num_queries", [(0, 3), (1, 9), (20, 9)])
 def test_models_invitationd_new_userd_user_creation_constant_num_queries(
     django_assert_num_queries, num_invitations, num_queries
 ):
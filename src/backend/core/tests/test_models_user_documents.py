@@ -0,0 +1,139 @@
+"""
+Unit tests for the UserDocument model indexing documents visible to each user
+"""
+
+import pytest
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def get_user_document(user, document):
+    """Return the index row of a user and a document or None."""
+    return models.UserDocument.objects.filter(user=user, document=document).first()
+
+
+def test_models_user_documents_str():
+    """The str representation should include the user email and document title."""
+    access = factories.UserDocumentAccessFactory(
+        user__email="david.bowman@example.com", document__title="admins"
+    )
+    assert (
+        str(get_user_document(access.user, access.document))
+        == "david.bowman@example.com relation to document admins"
+    )
+
+
+def test_models_user_documents_access():
+    """Creating, updating and deleting a user access should be reflected in the index."""
+    access = factories.UserDocumentAccessFactory(role="reader")
+
+    user_document = get_user_document(access.user, access.document)
+    assert user_document.role == "reader"
+    assert user_document.is_visible is True
+    assert user_document.is_favorite is False
+    assert user_document.has_link_trace is False
+
+    access.role = "editor"
+    access.save()
+    assert get_user_document(access.user, access.document).role == "editor"
+
+    access.delete()
+    assert get_user_document(access.user, access.document) is None
+
+
+def test_models_user_documents_team_access():
+    """Accesses given to teams should not be indexed."""
+    factories.TeamDocumentAccessFactory()
+    assert models.UserDocument.objects.exists() is False
+
+
+@pytest.mark.parametrize(
+    "reach, is_visible",
+    [("restricted", False), ("authenticated", True), ("public", True)],
+)
+def test_models_user_documents_link_trace(reach, is_visible):
+    """Documents visited via their link should be visible unless their reach is restricted."""
+    document = factories.DocumentFactory(link_reach=reach)
+    user = factories.UserFactory()
+
+    models.LinkTrace.objects.create(document=document, user=user)
+
+    user_document = get_user_document(user, document)
+    assert user_document.role == ""
+    assert user_document.has_link_trace is True
+    assert user_document.is_visible is is_visible
+
+
+def test_models_user_documents_link_reach_change():
+    """Changing the link reach of a document should update its visibility for visitors."""
+    document = factories.DocumentFactory(link_reach="public")
+    visitor, member = factories.UserFactory.create_batch(2)
+    models.LinkTrace.objects.create(document=document, user=visitor)
+    models.LinkTrace.objects.create(document=document, user=member)
+    factories.UserDocumentAccessFactory(document=document, user=member)
+
+    document.link_reach = "restricted"
+    document.save()
+
+    assert get_user_document(visitor, document).is_visible is False
+    assert get_user_document(member, document).is_visible is True
+
+    document.link_reach = "authenticated"
+    document.save()
+
+    assert get_user_document(visitor, document).is_visible is True
+
+
+def test_models_user_documents_favorite():
+    """Favorites should be indexed without making a document visible on their own."""
+    document = factories.DocumentFactory()
+    user = factories.UserFactory()
+
+    favorite = models.DocumentFavorite.objects.create(document=document, user=user)
+
+    user_document = get_user_document(user, document)
+    assert user_document.is_favorite is True
+    assert user_document.is_visible is False
+
+    factories.UserDocumentAccessFactory(document=document, user=user)
+    favorite.delete()
+
+    user_document = get_user_document(user, document)
+    assert user_document.is_favorite is False
+    assert user_document.is_visible is True
+
+
+def test_models_user_documents_delete_document():
+    """Deleting a document should delete its rows without recomputing them."""
+    document = factories.DocumentFactory(link_reach="public")
+    user = factories.UserFactory()
+    factories.UserDocumentAccessFactory(document=document, user=user)
+    models.LinkTrace.objects.create(document=document, user=user)
+    models.DocumentFavorite.objects.create(document=document, user=user)
+
+    document.delete()
+
+    assert models.UserDocument.objects.exists() is False
+
+
+def test_models_user_documents_delete_user():
+    """Deleting a user should delete their rows without recomputing them."""
+    access = factories.UserDocumentAccessFactory()
+    models.LinkTrace.objects.create(document=access.document, user=access.user)
+
+    access.user.delete()
+
+    assert models.UserDocument.objects.exists() is False
+
+
+def test_models_user_documents_invitations():
+    """Accesses created in bulk from invitations should be indexed."""
+    invitation = factories.InvitationFactory(role="editor")
+
+    user = factories.UserFactory(email=invitation.email)
+
+    user_document = get_user_document(user, invitation.document)
+    assert user_document.role == "editor"
+    assert user_document.is_visible is True
@@ -161,6 +161,15 @@ def create_demo(stdout):
                         document_id=doc_id, user_id=user_id, role=role[0]
                     )
                 )
+                # Bulk creation does not send the signals maintaining the index
+                queue.push(
+                    models.UserDocument(
+                        document_id=doc_id,
+                        user_id=user_id,
+                        role=role[0],
+                        is_visible=True,
+                    )
+                )
         queue.flush()
 
     with Timeit(stdout, "Creating development users"):
@@ -192,9 +201,24 @@ def create_demo(stdout):
                         document_id=doc_id, user_id=user_id, role=role[0]
                     )
                 )
+                # Bulk creation does not send the signals maintaining the index
+                queue.push(
+                    models.UserDocument(
+                        document_id=doc_id,
+                        user_id=user_id,
+                        role=role[0],
+                        is_visible=True,
+                    )
+                )
 
         queue.flush()
 
+    with Timeit(stdout, "Counting docs accesses"):
+        # Bulk creation does not maintain the number of accesses of documents
+        models.Document.repair_nb_accesses(
+            models.Document.objects.values_list("id", flat=True)
+        )
+
     with Timeit(stdout, "Creating Template"):
         with open(
             file="demo/data/template/code.txt", mode="r", encoding="utf-8"
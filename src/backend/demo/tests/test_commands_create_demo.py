@@ -1,6 +1,7 @@
 """Test the `create_demo` management command"""
 
 from django.core.management import call_command
+from django.db.models import Sum
 from django.test import override_settings
 
 import pytest
@@ -19,6 +20,14 @@ def test_commands_create_demo():
     assert models.User.objects.count() >= 50
     assert models.Document.objects.count() >= 50
     assert models.DocumentAccess.objects.count() > 50
+    assert (
+        models.UserDocument.objects.filter(is_visible=True).count()
+        == models.DocumentAccess.objects.count()
+    )
+    assert (
+        models.Document.objects.aggregate(total=Sum("nb_accesses"))["total"]
+        == models.DocumentAccess.objects.count()
+    )
 
     # assert dev users have doc accesses
     user = models.User.objects.get(email="impress@impress.world")
@@ -213,6 +213,63 @@ class Base(Configuration):
         "image/svg+xml",
     ]
 
+    # Document content
+    DOCUMENT_CONTENT_FETCH_MAX_WORKERS = values.PositiveIntegerValue(
+        10,
+        environ_name="DOCUMENT_CONTENT_FETCH_MAX_WORKERS",
+        environ_prefix=None,
+    )
+    # Cache alias used to serve document contents without hitting object storage
+    DOCUMENT_CONTENT_CACHE_ALIAS = values.Value(
+        "default",
+        environ_name="DOCUMENT_CONTENT_CACHE_ALIAS",
+        environ_prefix=None,
+    )
+    DOCUMENT_CONTENT_CACHE_TIMEOUT = values.PositiveIntegerValue(
+        60 * 60,  # 1 hour, set to 0 to disable the cache
+        environ_name="DOCUMENT_CONTENT_CACHE_TIMEOUT",
+        environ_prefix=None,
+    )
+    # Contents bigger than this size are cached for a time inversely proportional
+    # to their size
+    DOCUMENT_CONTENT_CACHE_SIZE_THRESHOLD = values.PositiveIntegerValue(
+        100 * 1024,  # 100KB
+        environ_name="DOCUMENT_CONTENT_CACHE_SIZE_THRESHOLD",
+        environ_prefix=None,
+    )
+    # Contents bigger than this size are never cached
+    DOCUMENT_CONTENT_CACHE_MAX_SIZE = values.PositiveIntegerValue(
+        2 * (2**20),  # 2MB
+        environ_name="DOCUMENT_CONTENT_CACHE_MAX_SIZE",
+        environ_prefix=None,
+    )
+    # Store document contents gzipped in object storage. Contents stored uncompressed
+    # remain readable and can be compressed with the "compress_documents" command.
+    DOCUMENT_CONTENT_COMPRESSION = values.BooleanValue(
+        False, environ_name="DOCUMENT_CONTENT_COMPRESSION", environ_prefix=None
+    )
+    DOCUMENT_CONTENT_COMPRESSION_LEVEL = values.PositiveIntegerValue(
+        6, environ_name="DOCUMENT_CONTENT_COMPRESSION_LEVEL", environ_prefix=None
+    )
+    # Acknowledge content updates as soon as they are staged in the cache and write
+    # them to object storage asynchronously in a celery task
+    DOCUMENT_CONTENT_WRITE_BEHIND = values.BooleanValue(
+        False, environ_name="DOCUMENT_CONTENT_WRITE_BEHIND", environ_prefix=None
+    )
+    # Cache alias used to stage contents until they are written to object storage.
+    # It must be shared between all processes and must not evict keys (e.g. Redis
+    # with a "noeviction" or "volatile-*" policy).
+    DOCUMENT_CONTENT_STAGING_CACHE_ALIAS = values.Value(
+        "default",
+        environ_name="DOCUMENT_CONTENT_STAGING_CACHE_ALIAS",
+        environ_prefix=None,
+    )
+    # Delay in seconds before staged contents are written to object storage. Saves of
+    # the same document during this delay are coalesced into one write.
+    DOCUMENT_CONTENT_WRITE_BEHIND_DELAY = values.PositiveIntegerValue(
+        2, environ_name="DOCUMENT_CONTENT_WRITE_BEHIND_DELAY", environ_prefix=None
+    )
+
     # Document versions
     DOCUMENT_VERSIONS_PAGE_SIZE = 50
 
@@ -317,6 +374,9 @@ class Base(Configuration):
     CACHES = {
         "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
     }
+    METRICS_CACHE_ALIAS = values.Value(
+        "default", environ_name="METRICS_CACHE_ALIAS", environ_prefix=None
+    )
 
     REST_FRAMEWORK = {
         "DEFAULT_AUTHENTICATION_CLASSES": (